@@ -3,6 +3,7 @@ import json
 import logging
 from math import floor, log10
 import socket
+import threading
 
 __version__ = "0.0.7.2"
 
@@ -169,9 +170,51 @@ class UnixDomainSocketRpc(object):
         self._compat = True
         self.next_id = 0
 
-    def _writeobj(self, sock, obj):
-        s = json.dumps(obj, cls=self.encoder_cls)
-        sock.sendall(bytearray(s, 'UTF-8'))
+        # Each thread keeps its own connection open across calls: on a
+        # shared socket, whichever thread reads first would get another
+        # thread's response.
+        self._local = threading.local()
+
+    def _close(self):
+        """Drop this thread's connection, if any"""
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            sock.close()
+        self._local.sock = None
+
+    def _send(self, objs):
+        """Write `objs` on this thread's connection, opening it if needed
+
+        If lightningd went away since the previous call (e.g. it was
+        restarted) the write fails, so we retry once on a fresh connection.
+        """
+        data = bytearray(''.join(json.dumps(o, cls=self.encoder_cls) for o in objs), 'UTF-8')
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            try:
+                sock.sendall(data)
+                return sock
+            except (BrokenPipeError, ConnectionResetError):
+                self._close()
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.socket_path)
+        self._local.sock = sock
+        self._local.buff = b''
+        sock.sendall(data)
+        return sock
+
+    def _recv(self, sock):
+        """Read the next response from this thread's connection"""
+        try:
+            resp, self._local.buff = self._readobj_compat(sock, self._local.buff)
+        except BaseException:
+            # We don't know where in the stream we are anymore.
+            self._close()
+            raise
+        if 'id' not in resp:
+            self._close()
+        return resp
 
     def _readobj_compat(self, sock, buff=b''):
         if not self._compat:
@@ -186,7 +229,7 @@ class UnixDomainSocketRpc(object):
                     self._compat = False
 
                 if len(b) == 0:
-                    return {'error': 'Connection to RPC server lost.'}
+                    return {'error': 'Connection to RPC server lost.'}, buff
                 if b' }\n' not in buff:
                     continue
                 # Convert late to UTF-8 so glyphs split across recvs do not
@@ -231,26 +274,27 @@ class UnixDomainSocketRpc(object):
                 return self.call(name, payload=kwargs)
         return wrapper
 
-    def call(self, method, payload=None):
-        self.logger.debug("Calling %s with payload %r", method, payload)
-
+    @staticmethod
+    def _clean_payload(payload):
         if payload is None:
             payload = {}
         # Filter out arguments that are None
         if isinstance(payload, dict):
             payload = {k: v for k, v in payload.items() if v is not None}
+        return payload
 
-        # FIXME: we open a new socket for every readobj call...
-        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-        sock.connect(self.socket_path)
-        self._writeobj(sock, {
+    def call(self, method, payload=None):
+        self.logger.debug("Calling %s with payload %r", method, payload)
+
+        payload = self._clean_payload(payload)
+
+        sock = self._send([{
             "method": method,
             "params": payload,
             "id": self.next_id,
-        })
+        }])
         self.next_id += 1
-        resp, _ = self._readobj_compat(sock)
-        sock.close()
+        resp = self._recv(sock)
 
         self.logger.debug("Received response for %s call: %r", method, resp)
         if "error" in resp:
@@ -259,6 +303,43 @@ class UnixDomainSocketRpc(object):
             raise ValueError("Malformed response, \"result\" missing.")
         return resp["result"]
 
+    def batch(self, calls):
+        """Send several calls over one connection and return their results
+
+        `calls` is a list of `(method, payload)` tuples. All requests are
+        written at once before any response is read, so they only cost a
+        single round-trip. Results are returned in the same order as `calls`; the
+        first call that failed raises an `RpcError`.
+        """
+        requests = [(method, self._clean_payload(payload)) for method, payload in calls]
+        self.logger.debug("Calling batch %r", requests)
+
+        ids = list(range(self.next_id, self.next_id + len(requests)))
+        self.next_id += len(requests)
+        sock = self._send([{
+            "method": method,
+            "params": payload,
+            "id": i,
+        } for (method, payload), i in zip(requests, ids)])
+
+        resps = {}
+        while len(resps) < len(ids):
+            resp = self._recv(sock)
+            if "id" not in resp:
+                raise RpcError("batch", requests, resp.get('error'))
+            resps[resp["id"]] = resp
+
+        self.logger.debug("Received responses for batch: %r", resps)
+        results = []
+        for (method, payload), i in zip(requests, ids):
+            resp = resps[i]
+            if "error" in resp:
+                raise RpcError(method, payload, resp['error'])
+            elif "result" not in resp:
+                raise ValueError("Malformed response, \"result\" missing.")
+            results.append(resp["result"])
+        return results
+
 
 class LightningRpc(UnixDomainSocketRpc):
     """
@@ -270,8 +351,8 @@ class LightningRpc(UnixDomainSocketRpc):
     keyword argument. If `async` is set to true then the method
     returns a future immediately, instead of blocking indefinitely.
 
-    This implementation is thread safe in that it locks the socket
-    between calls, but it does not (yet) support concurrent calls.
+    This implementation is thread safe in that every thread keeps its
+    own connection to the daemon, open across calls.
     """
 
     class LightningJSONEncoder(json.JSONEncoder):
@@ -1,4 +1,11 @@
-from lightning import Millisatoshi
+from lightning import LightningRpc, Millisatoshi, RpcError
+import itertools
+import json
+import os
+import pytest
+import socket
+import tempfile
+import threading
 
 
 def test_to_approx_str():
@@ -34,3 +41,126 @@ def test_to_approx_str():
     assert amount.to_approx_str() == "12btc"
     amount = Millisatoshi('1200000000sat')
     assert amount.to_approx_str(1) == "12btc"  # note: no rounding
+
+
+class FakeRpcServer(object):
+    """Stands in for lightningd's unix socket in the tests below.
+    """
+    def __init__(self, sockpath):
+        self.sockpath = sockpath
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(sockpath)
+        self.sock.listen(1)
+        # Nothing may block forever: a stuck client or server fails the test.
+        self.sock.settimeout(10)
+        self.accepts = 0
+
+    def serve(self, handler):
+        """Accept connections in the background, one at a time.
+
+        Each connection is passed to `handler(conn, requests)`, where
+        `requests` yields the request objects read from it until EOF,
+        and is closed once the handler returns.
+        """
+        def run():
+            while True:
+                try:
+                    conn, _ = self.sock.accept()
+                except OSError:
+                    return
+                self.accepts += 1
+                conn.settimeout(10)
+                with conn:
+                    try:
+                        handler(conn, self._requests(conn))
+                    except OSError:
+                        pass
+
+        threading.Thread(target=run, daemon=True).start()
+
+    @staticmethod
+    def _requests(conn):
+        decoder = json.JSONDecoder()
+        buff = ''
+        while True:
+            b = conn.recv(1024)
+            if len(b) == 0:
+                return
+            buff += b.decode('UTF-8')
+            while buff:
+                try:
+                    req, used = decoder.raw_decode(buff)
+                except ValueError:
+                    break
+                yield req
+                buff = buff[used:].lstrip()
+
+    @staticmethod
+    def reply(conn, req, result=None, error=None):
+        if error is not None:
+            resp = '"error": {}'.format(json.dumps(error))
+        else:
+            resp = '"result": {}'.format(json.dumps(result))
+        conn.sendall('{{ "jsonrpc": "2.0", "id": {}, {} }}\n\n'.format(req['id'], resp).encode('UTF-8'))
+
+
+@pytest.fixture
+def rpc_server():
+    sockdir = tempfile.mkdtemp()
+    server = FakeRpcServer(os.path.join(sockdir, 'lightning-rpc'))
+    try:
+        yield server
+    finally:
+        server.sock.close()
+        os.unlink(server.sockpath)
+        os.rmdir(sockdir)
+
+
+def test_batch(rpc_server):
+    """Requests are pipelined on one socket, responses matched up by id.
+    """
+    def handler(conn, requests):
+        while True:
+            batch = list(itertools.islice(requests, 3))
+            if not batch:
+                return
+            # Answer out of order, to check that we demux by id.
+            for req in reversed(batch):
+                if req['method'] == 'fail':
+                    rpc_server.reply(conn, req, error={'code': -1, 'message': 'failed'})
+                else:
+                    rpc_server.reply(conn, req, {'method': req['method'], 'params': req['params']})
+
+    rpc_server.serve(handler)
+    rpc = LightningRpc(rpc_server.sockpath)
+    results = rpc.batch([('getinfo', None),
+                         ('listinvoices', {'label': 'a', 'other': None}),
+                         ('listpeers', ['id'])])
+    assert results == [{'method': 'getinfo', 'params': {}},
+                       {'method': 'listinvoices', 'params': {'label': 'a'}},
+                       {'method': 'listpeers', 'params': ['id']}]
+
+    with pytest.raises(RpcError, match='fail'):
+        rpc.batch([('getinfo', None), ('fail', None), ('listpeers', None)])
+
+
+def test_persistent_connection(rpc_server):
+    """Calls reuse one connection, and reconnect once the server drops it.
+    """
+    hung_up = threading.Event()
+
+    def handler(conn, requests):
+        for req in itertools.islice(requests, 3):
+            rpc_server.reply(conn, req, req['method'])
+        # Hang up, like a restarting lightningd would.
+        conn.close()
+        hung_up.set()
+
+    rpc_server.serve(handler)
+    rpc = LightningRpc(rpc_server.sockpath)
+    assert [rpc.getinfo(), rpc.listpeers(), rpc.listfunds()] == ['getinfo', 'listpeers', 'listfunds']
+    assert rpc_server.accepts == 1
+
+    assert hung_up.wait(10)
+    assert rpc.listinvoices() == 'listinvoices'
+    assert rpc_server.accepts == 2
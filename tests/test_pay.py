@@ -1,20 +1,18 @@
 from fixtures import *  # noqa: F401,F403
 from flaky import flaky  # noqa: F401
 from lightning import RpcError, Millisatoshi
-from utils import DEVELOPER, wait_for, only_one, sync_blockheight, SLOW_MACHINE
+from utils import DEVELOPER, wait_for, only_one, sync_blockheight, SLOW_MACHINE, TIMEOUT
 
 
-import copy
-import concurrent.futures
+import os
 import pytest
 import random
 import re
-import string
 import time
 import unittest
 
 
-def test_pay(node_factory):
+def test_pay(node_factory, executor):
     l1, l2 = node_factory.line_graph(2)
 
     inv = l2.rpc.invoice(123000, 'test_pay', 'description')['bolt11']
@@ -46,13 +44,17 @@ def test_pay(node_factory):
     assert len(outputs) == 1 and outputs[0]['q'] != 0
 
     # Check payment of any-amount invoice.
-    for i in range(5):
-        label = "any{}".format(i)
-        inv2 = l2.rpc.invoice("any", label, 'description')['bolt11']
+    invs = [r['bolt11'] for r in l2.rpc.batch([
+        ('invoice', ['any', 'any{}'.format(i), 'description']) for i in range(5)
+    ])]
+    for inv2 in invs:
         # Must provide an amount!
         with pytest.raises(RpcError):
             l1.rpc.pay(inv2)
-        l1.rpc.pay(inv2, random.randint(1000, 999999))
+    futs = [executor.submit(l1.rpc.pay, inv2, random.randint(1000, 999999))
+            for inv2 in invs]
+    for fut in futs:
+        fut.result(TIMEOUT)
 
     # Should see 6 completed payments
     assert len(l1.rpc.listsendpays()['payments']) == 6
@@ -273,7 +275,7 @@ def test_payment_success_persistence(node_factory, bitcoind, executor):
     # Should reconnect, and sort the payment out.
     l1.start()
 
-    wait_for(lambda: l1.rpc.listsendpays()['payments'][0]['status'] != 'pending')
+    l1.rpc.waitsendpay(inv1['payment_hash'])
 
     payments = l1.rpc.listsendpays()['payments']
     invoices = l2.rpc.listinvoices('inv1')['invoices']
@@ -316,12 +318,13 @@ def test_payment_failed_persistence(node_factory, executor):
     del l1.daemon.opts['dev-disconnect']
 
     # Make sure invoice has expired.
-    time.sleep(5 + 1)
+    wait_for(lambda: only_one(l2.rpc.listinvoices('inv1')['invoices'])['status'] == 'expired')
 
     # Should reconnect, and fail the payment
     l1.start()
 
-    wait_for(lambda: l1.rpc.listsendpays()['payments'][0]['status'] != 'pending')
+    with pytest.raises(RpcError):
+        l1.rpc.waitsendpay(inv1['payment_hash'])
 
     payments = l1.rpc.listsendpays()['payments']
     invoices = l2.rpc.listinvoices('inv1')['invoices']
@@ -390,32 +393,28 @@ def test_sendpay(node_factory):
 
     # Insufficient funds.
     with pytest.raises(RpcError):
-        rs = copy.deepcopy(routestep)
-        rs['msatoshi'] = rs['msatoshi'] - 1
+        rs = {**routestep, 'msatoshi': routestep['msatoshi'] - 1}
         l1.rpc.sendpay([rs], rhash)
         l1.rpc.waitsendpay(rhash)
     assert invoice_unpaid(l2, 'testpayment2')
 
     # Gross overpayment (more than factor of 2)
     with pytest.raises(RpcError):
-        rs = copy.deepcopy(routestep)
-        rs['msatoshi'] = rs['msatoshi'] * 2 + 1
+        rs = {**routestep, 'msatoshi': routestep['msatoshi'] * 2 + 1}
         l1.rpc.sendpay([rs], rhash)
         l1.rpc.waitsendpay(rhash)
     assert invoice_unpaid(l2, 'testpayment2')
 
     # Insufficient delay.
     with pytest.raises(RpcError):
-        rs = copy.deepcopy(routestep)
-        rs['delay'] = rs['delay'] - 2
+        rs = {**routestep, 'delay': routestep['delay'] - 2}
         l1.rpc.sendpay([rs], rhash)
         l1.rpc.waitsendpay(rhash)
     assert invoice_unpaid(l2, 'testpayment2')
 
     # Bad ID.
     with pytest.raises(RpcError):
-        rs = copy.deepcopy(routestep)
-        rs['id'] = '00000000000000000000000000000000'
+        rs = {**routestep, 'id': '00000000000000000000000000000000'}
         l1.rpc.sendpay([rs], rhash)
     assert invoice_unpaid(l2, 'testpayment2')
 
@@ -439,9 +438,10 @@ def test_sendpay(node_factory):
     assert details['created_at'] >= before
     assert details['created_at'] <= after
     # Check receiver
-    assert only_one(l2.rpc.listinvoices('testpayment2')['invoices'])['status'] == 'paid'
-    assert only_one(l2.rpc.listinvoices('testpayment2')['invoices'])['pay_index'] == 1
-    assert only_one(l2.rpc.listinvoices('testpayment2')['invoices'])['msatoshi_received'] == rs['msatoshi']
+    inv = only_one(l2.rpc.listinvoices('testpayment2')['invoices'])
+    assert inv['status'] == 'paid'
+    assert inv['pay_index'] == 1
+    assert inv['msatoshi_received'] == rs['msatoshi']
 
     # Balances should reflect it.
     def check_balances():
@@ -462,8 +462,9 @@ def test_sendpay(node_factory):
     preimage2 = details['payment_preimage']
     assert preimage == preimage2
     l1.daemon.wait_for_log('... succeeded')
-    assert only_one(l2.rpc.listinvoices('testpayment2')['invoices'])['status'] == 'paid'
-    assert only_one(l2.rpc.listinvoices('testpayment2')['invoices'])['msatoshi_received'] == rs['msatoshi']
+    inv = only_one(l2.rpc.listinvoices('testpayment2')['invoices'])
+    assert inv['status'] == 'paid'
+    assert inv['msatoshi_received'] == rs['msatoshi']
 
     # Overpaying by "only" a factor of 2 succeeds.
     rhash = l2.rpc.invoice(amt, 'testpayment3', 'desc')['payment_hash']
@@ -471,26 +472,29 @@ def test_sendpay(node_factory):
     routestep = {'msatoshi': amt * 2, 'id': l2.info['id'], 'delay': 5, 'channel': '1x1x1'}
     l1.rpc.sendpay([routestep], rhash)
     preimage3 = l1.rpc.waitsendpay(rhash)['payment_preimage']
-    assert only_one(l2.rpc.listinvoices('testpayment3')['invoices'])['status'] == 'paid'
-    assert only_one(l2.rpc.listinvoices('testpayment3')['invoices'])['msatoshi_received'] == amt * 2
+    inv = only_one(l2.rpc.listinvoices('testpayment3')['invoices'])
+    assert inv['status'] == 'paid'
+    assert inv['msatoshi_received'] == amt * 2
 
     # Test listsendpays
-    payments = l1.rpc.listsendpays()['payments']
+    invoice2, invoice3 = [only_one(r['invoices']) for r in l2.rpc.batch([
+        ('listinvoices', {'label': 'testpayment2'}),
+        ('listinvoices', {'label': 'testpayment3'}),
+    ])]
+    payments, payments2, payments3 = [r['payments'] for r in l1.rpc.batch([
+        ('listsendpays', None),
+        ('listsendpays', {'payment_hash': invoice2['payment_hash']}),
+        ('listsendpays', {'payment_hash': invoice3['payment_hash']}),
+    ])]
     assert len(payments) == 2
 
-    invoice2 = only_one(l2.rpc.listinvoices('testpayment2')['invoices'])
-    payments = l1.rpc.listsendpays(payment_hash=invoice2['payment_hash'])['payments']
-    assert len(payments) == 1
-
-    assert payments[0]['status'] == 'complete'
-    assert payments[0]['payment_preimage'] == preimage2
-
-    invoice3 = only_one(l2.rpc.listinvoices('testpayment3')['invoices'])
-    payments = l1.rpc.listsendpays(payment_hash=invoice3['payment_hash'])['payments']
-    assert len(payments) == 1
+    assert len(payments2) == 1
+    assert payments2[0]['status'] == 'complete'
+    assert payments2[0]['payment_preimage'] == preimage2
 
-    assert payments[0]['status'] == 'complete'
-    assert payments[0]['payment_preimage'] == preimage3
+    assert len(payments3) == 1
+    assert payments3[0]['status'] == 'complete'
+    assert payments3[0]['payment_preimage'] == preimage3
 
 
 def test_sendpay_cant_afford(node_factory):
@@ -499,7 +503,7 @@ def test_sendpay_cant_afford(node_factory):
     # Can't pay more than channel capacity.
     def pay(lsrc, ldst, amt, label=None):
         if not label:
-            label = ''.join(random.choice(string.ascii_letters + string.digits) for _ in range(20))
+            label = os.urandom(10).hex()
         rhash = ldst.rpc.invoice(amt, label, label)['payment_hash']
         routestep = {'msatoshi': amt, 'id': ldst.info['id'], 'delay': 5, 'channel': '1x1x1'}
         lsrc.rpc.sendpay([routestep], rhash)
@@ -832,32 +836,64 @@ def test_forward(node_factory, bitcoind):
                   'channel': chanid2}]
 
     # Unknown other peer
-    route = copy.deepcopy(baseroute)
+    route = [dict(h) for h in baseroute]
     route[1]['id'] = '031a8dc444e41bb989653a4501e11175a488a57439b0c4947704fd6e3de5dca607'
     l1.rpc.sendpay(route, rhash)
     with pytest.raises(RpcError):
         l1.rpc.waitsendpay(rhash)
 
     # Delay too short (we always add one internally anyway, so subtract 2 here).
-    route = copy.deepcopy(baseroute)
+    route = [dict(h) for h in baseroute]
     route[0]['delay'] = 8
     l1.rpc.sendpay(route, rhash)
     with pytest.raises(RpcError):
         l1.rpc.waitsendpay(rhash)
 
     # Final delay too short
-    route = copy.deepcopy(baseroute)
+    route = [dict(h) for h in baseroute]
     route[1]['delay'] = 3
     l1.rpc.sendpay(route, rhash)
     with pytest.raises(RpcError):
         l1.rpc.waitsendpay(rhash)
 
     # This one works
-    route = copy.deepcopy(baseroute)
+    route = [dict(h) for h in baseroute]
     l1.rpc.sendpay(route, rhash)
     l1.rpc.waitsendpay(rhash)
 
 
+def setup_fees_and_cltv_test(node_factory, bitcoind):
+    # l1 -> l2 -> l3, with the cltv-deltas and fees of A, B and C in the
+    # BOLT #7 example: the nodes start in parallel, then both channels are
+    # funded and announced.
+    l1, l2, l3 = node_factory.get_nodes(3, opts=[
+        {'cltv-delta': 10, 'fee-base': 100, 'fee-per-satoshi': 1000},
+        {'cltv-delta': 20, 'fee-base': 200, 'fee-per-satoshi': 2000},
+        {'cltv-delta': 30, 'cltv-final': 9, 'fee-base': 300, 'fee-per-satoshi': 3000},
+    ])
+
+    ret = l1.rpc.connect(l2.info['id'], 'localhost', l2.port)
+    assert ret['id'] == l2.info['id']
+
+    l1.daemon.wait_for_log('openingd-.*: Handed peer, entering loop')
+    l2.daemon.wait_for_log('openingd-.*: Handed peer, entering loop')
+
+    ret = l2.rpc.connect(l3.info['id'], 'localhost', l3.port)
+    assert ret['id'] == l3.info['id']
+
+    l2.daemon.wait_for_log('openingd-.*: Handed peer, entering loop')
+    l3.daemon.wait_for_log('openingd-.*: Handed peer, entering loop')
+
+    c1 = l1.fund_channel(l2, 10**6)
+    c2 = l2.fund_channel(l3, 10**6)
+    bitcoind.generate_block(5)
+
+    # Make sure l1 has seen announce for all channels.
+    l1.wait_channel_active(c1)
+    l1.wait_channel_active(c2)
+    return l1, l2, l3
+
+
 @unittest.skipIf(not DEVELOPER, "needs DEVELOPER=1 for --dev-broadcast-interval")
 def test_forward_different_fees_and_cltv(node_factory, bitcoind):
     # FIXME: Check BOLT quotes here too
@@ -892,29 +928,7 @@ def test_forward_different_fees_and_cltv(node_factory, bitcoind):
     # 1. D: 400 base + 4000 millionths
 
     # We don't do D yet.
-    l1 = node_factory.get_node(options={'cltv-delta': 10, 'fee-base': 100, 'fee-per-satoshi': 1000})
-    l2 = node_factory.get_node(options={'cltv-delta': 20, 'fee-base': 200, 'fee-per-satoshi': 2000})
-    l3 = node_factory.get_node(options={'cltv-delta': 30, 'cltv-final': 9, 'fee-base': 300, 'fee-per-satoshi': 3000})
-
-    ret = l1.rpc.connect(l2.info['id'], 'localhost', l2.port)
-    assert ret['id'] == l2.info['id']
-
-    l1.daemon.wait_for_log('openingd-.*: Handed peer, entering loop')
-    l2.daemon.wait_for_log('openingd-.*: Handed peer, entering loop')
-
-    ret = l2.rpc.connect(l3.info['id'], 'localhost', l3.port)
-    assert ret['id'] == l3.info['id']
-
-    l2.daemon.wait_for_log('openingd-.*: Handed peer, entering loop')
-    l3.daemon.wait_for_log('openingd-.*: Handed peer, entering loop')
-
-    c1 = l1.fund_channel(l2, 10**6)
-    c2 = l2.fund_channel(l3, 10**6)
-    bitcoind.generate_block(5)
-
-    # Make sure l1 has seen announce for all channels.
-    l1.wait_channel_active(c1)
-    l1.wait_channel_active(c2)
+    l1, l2, l3 = setup_fees_and_cltv_test(node_factory, bitcoind)
 
     # BOLT #7:
     #
@@ -983,13 +997,14 @@ def test_forward_different_fees_and_cltv(node_factory, bitcoind):
     assert only_one(l3.rpc.listinvoices('test_forward_different_fees_and_cltv')['invoices'])['status'] == 'paid'
 
     # Check that we see all the channels
-    shortids = set(c['short_channel_id'] for c in l2.rpc.listchannels()['channels'])
+    shortids = {c['short_channel_id'] for c in l2.rpc.listchannels()['channels']}
+    by_scid = {}
+    for c in l1.rpc.listchannels()['channels']:
+        by_scid.setdefault(c['short_channel_id'], []).append(c)
     for scid in shortids:
-        c = l1.rpc.listchannels(scid)['channels']
+        c = by_scid.get(scid, [])
         # We get one entry for each direction.
         assert len(c) == 2
-        assert c[0]['short_channel_id'] == scid
-        assert c[1]['short_channel_id'] == scid
         assert c[0]['source'] == c[1]['destination']
         assert c[1]['source'] == c[0]['destination']
 
@@ -998,29 +1013,7 @@ def test_forward_different_fees_and_cltv(node_factory, bitcoind):
 def test_forward_pad_fees_and_cltv(node_factory, bitcoind):
     """Test that we are allowed extra locktime delta, and fees"""
 
-    l1 = node_factory.get_node(options={'cltv-delta': 10, 'fee-base': 100, 'fee-per-satoshi': 1000})
-    l2 = node_factory.get_node(options={'cltv-delta': 20, 'fee-base': 200, 'fee-per-satoshi': 2000})
-    l3 = node_factory.get_node(options={'cltv-delta': 30, 'cltv-final': 9, 'fee-base': 300, 'fee-per-satoshi': 3000})
-
-    ret = l1.rpc.connect(l2.info['id'], 'localhost', l2.port)
-    assert ret['id'] == l2.info['id']
-
-    l1.daemon.wait_for_log('openingd-.*: Handed peer, entering loop')
-    l2.daemon.wait_for_log('openingd-.*: Handed peer, entering loop')
-
-    ret = l2.rpc.connect(l3.info['id'], 'localhost', l3.port)
-    assert ret['id'] == l3.info['id']
-
-    l2.daemon.wait_for_log('openingd-.*: Handed peer, entering loop')
-    l3.daemon.wait_for_log('openingd-.*: Handed peer, entering loop')
-
-    c1 = l1.fund_channel(l2, 10**6)
-    c2 = l2.fund_channel(l3, 10**6)
-    bitcoind.generate_block(5)
-
-    # Make sure l1 has seen announce for all channels.
-    l1.wait_channel_active(c1)
-    l1.wait_channel_active(c2)
+    l1, l2, l3 = setup_fees_and_cltv_test(node_factory, bitcoind)
 
     route = l1.rpc.getroute(l3.info['id'], 4999999, 1)["route"]
     assert len(route) == 2
@@ -1089,7 +1082,7 @@ def test_forward_stats(node_factory, bitcoind):
 
     # Select all forwardings, ordered by htlc_id to ensure the order
     # matches below
-    forwardings = l2.db_query("SELECT *, in_msatoshi - out_msatoshi as fee "
+    forwardings = l2.db_query("SELECT in_msatoshi - out_msatoshi as fee, state "
                               "FROM forwarded_payments "
                               "ORDER BY in_htlc_id;")
     assert(len(forwardings) == 3)
@@ -1326,8 +1319,8 @@ def test_forward_local_failed_stats(node_factory, bitcoind, executor):
     bitcoind.generate_block(100)
     sync_blockheight(bitcoind, [l2])
 
-    # give time to let l2 store the local_failed stats
-    time.sleep(5)
+    # wait for l2 to store the local_failed stats
+    wait_for(lambda: [f['status'] for f in l2.rpc.listforwards()['forwards']] == ['local_failed'] * 5)
 
     # Select all forwardings, and check the status
     stats = l2.rpc.listforwards()
@@ -1335,11 +1328,7 @@ def test_forward_local_failed_stats(node_factory, bitcoind, executor):
     assert [f['status'] for f in stats['forwards']] == ['local_failed', 'local_failed', 'local_failed', 'local_failed', 'local_failed']
     assert l2.rpc.getinfo()['msatoshi_fees_collected'] == 0
 
-    assert 'received_time' in stats['forwards'][0] and 'resolved_time' not in stats['forwards'][0]
-    assert 'received_time' in stats['forwards'][1] and 'resolved_time' not in stats['forwards'][1]
-    assert 'received_time' in stats['forwards'][2] and 'resolved_time' not in stats['forwards'][2]
-    assert 'received_time' in stats['forwards'][3] and 'resolved_time' not in stats['forwards'][3]
-    assert 'received_time' in stats['forwards'][3] and 'resolved_time' not in stats['forwards'][4]
+    assert all('received_time' in f and 'resolved_time' not in f for f in stats['forwards'])
 
 
 @unittest.skipIf(not DEVELOPER or SLOW_MACHINE, "needs DEVELOPER=1 for dev_ignore_htlcs, and temporarily disabled on Travis")
@@ -1372,8 +1361,8 @@ def test_htlcs_cltv_only_difference(node_factory, bitcoind):
     r = l3.rpc.getroute(l4.info['id'], 10**8, 1)["route"]
     l3.rpc.sendpay(r, h)
 
-    # Give them time to go through.
-    time.sleep(5)
+    # Wait for them all to go through.
+    l4.daemon.wait_for_logs([r'their htlc .* dev_ignore_htlcs'] * 3)
 
     # Will all be connected OK.
     assert only_one(l1.rpc.listpeers(l2.info['id'])['peers'])['connected']
@@ -1419,14 +1408,12 @@ def test_pay_variants(node_factory):
 
 
 @unittest.skipIf(not DEVELOPER, "gossip without DEVELOPER=1 is slow")
-def test_pay_retry(node_factory, bitcoind):
+def test_pay_retry(node_factory, bitcoind, executor):
     """Make sure pay command retries properly. """
     def exhaust_channel(funder, fundee, scid, already_spent=0):
         """Spend all available capacity (10^6 - 1%) of channel"""
         maxpay = (10**6 - 10**6 // 100 - 13440) * 1000 - already_spent
-        inv = fundee.rpc.invoice(maxpay,
-                                 ''.join(random.choice(string.ascii_letters + string.digits) for _ in range(20)),
-                                 "exhaust_channel")
+        inv = fundee.rpc.invoice(maxpay, os.urandom(10).hex(), "exhaust_channel")
         routestep = {
             'msatoshi': maxpay,
             'id': fundee.info['id'],
@@ -1438,16 +1425,8 @@ def test_pay_retry(node_factory, bitcoind):
 
     # We connect every node to l5; in a line and individually.
     # Keep fixed fees so we can easily calculate exhaustion
-    l1, l2, l3, l4, l5 = node_factory.line_graph(5, fundchannel=False,
-                                                 opts={'feerates': (7500, 7500, 7500)})
-
-    # scid12
-    l1.fund_channel(l2, 10**6, wait_for_active=False)
-    # scid23
-    l2.fund_channel(l3, 10**6, wait_for_active=False)
-    # scid34
-    l3.fund_channel(l4, 10**6, wait_for_active=False)
-    scid45 = l4.fund_channel(l5, 10**6, wait_for_active=False)
+    l1, l2, l3, l4, l5 = node_factory.line_graph(5, opts={'feerates': (7500, 7500, 7500)})
+    scid45 = l4.get_channel_scid(l5)
 
     l1.rpc.connect(l5.info['id'], 'localhost', l5.port)
     scid15 = l1.fund_channel(l5, 10**6, wait_for_active=False)
@@ -1460,10 +1439,13 @@ def test_pay_retry(node_factory, bitcoind):
     bitcoind.generate_block(5)
     wait_for(lambda: len(l1.rpc.listchannels()['channels']) == 14)
 
-    # Exhaust shortcut channels one at a time, to force retries.
-    exhaust_channel(l1, l5, scid15)
-    exhaust_channel(l2, l5, scid25)
-    exhaust_channel(l3, l5, scid35)
+    # Exhaust each shortcut channel, to force retries.  They're independent,
+    # so drain them all at once.
+    futs = [executor.submit(exhaust_channel, l1, l5, scid15),
+            executor.submit(exhaust_channel, l2, l5, scid25),
+            executor.submit(exhaust_channel, l3, l5, scid35)]
+    for fut in futs:
+        fut.result(TIMEOUT)
 
     def listpays_nofail(b11):
         while True:
@@ -1472,12 +1454,12 @@ def test_pay_retry(node_factory, bitcoind):
                 if only_one(pays)['status'] == 'complete':
                     return
                 assert only_one(pays)['status'] != 'failed'
+            time.sleep(0.1)
 
     inv = l5.rpc.invoice(10**8, 'test_retry', 'test_retry')
 
     # Make sure listpays doesn't transiently show failure while pay
     # is retrying.
-    executor = concurrent.futures.ThreadPoolExecutor()
     fut = executor.submit(listpays_nofail, inv['bolt11'])
 
     # Pay l1->l5 should succeed via straight line (eventually)
@@ -1533,15 +1515,16 @@ def test_pay_routeboost(node_factory, bitcoind):
 
     # Status should show all the gory details.
     status = l1.rpc.call('paystatus', [inv['bolt11']])
-    assert only_one(status['pay'])['bolt11'] == inv['bolt11']
-    assert only_one(status['pay'])['msatoshi'] == 10**5
-    assert only_one(status['pay'])['amount_msat'] == Millisatoshi(10**5)
-    assert only_one(status['pay'])['destination'] == l4.info['id']
-    assert 'label' not in only_one(status['pay'])
-    assert 'routehint_modifications' not in only_one(status['pay'])
-    assert 'local_exclusions' not in only_one(status['pay'])
+    pay = only_one(status['pay'])
+    assert pay['bolt11'] == inv['bolt11']
+    assert pay['msatoshi'] == 10**5
+    assert pay['amount_msat'] == Millisatoshi(10**5)
+    assert pay['destination'] == l4.info['id']
+    assert 'label' not in pay
+    assert 'routehint_modifications' not in pay
+    assert 'local_exclusions' not in pay
     # First attempt will fail, then it will try route hint
-    attempts = only_one(status['pay'])['attempts']
+    attempts = pay['attempts']
     assert len(attempts) == 2
     assert attempts[0]['strategy'] == "Initial attempt"
     # FIXME!
@@ -1578,11 +1561,12 @@ def test_pay_routeboost(node_factory, bitcoind):
                                       'dev-routes': [routel3l4l5]})
         l1.rpc.pay(inv['bolt11'])
         status = l1.rpc.call('paystatus', [inv['bolt11']])
-        assert len(only_one(status['pay'])['attempts']) == 2
-        assert 'failure' in only_one(status['pay'])['attempts'][0]
-        assert 'success' not in only_one(status['pay'])['attempts'][0]
-        assert 'failure' not in only_one(status['pay'])['attempts'][1]
-        assert 'success' in only_one(status['pay'])['attempts'][1]
+        pay = only_one(status['pay'])
+        assert len(pay['attempts']) == 2
+        assert 'failure' in pay['attempts'][0]
+        assert 'success' not in pay['attempts'][0]
+        assert 'failure' not in pay['attempts'][1]
+        assert 'success' in pay['attempts'][1]
 
         # Finally, it should fall back to second routehint if first fails.
         # (Note, this is not public because it's not 6 deep)
@@ -1601,13 +1585,14 @@ def test_pay_routeboost(node_factory, bitcoind):
         l1.rpc.pay(inv['bolt11'], label="paying test_pay_routeboost5")
 
         status = l1.rpc.call('paystatus', [inv['bolt11']])
-        assert only_one(status['pay'])['bolt11'] == inv['bolt11']
-        assert only_one(status['pay'])['msatoshi'] == 10**5
-        assert only_one(status['pay'])['destination'] == l5.info['id']
-        assert only_one(status['pay'])['label'] == "paying test_pay_routeboost5"
-        assert 'routehint_modifications' not in only_one(status['pay'])
-        assert 'local_exclusions' not in only_one(status['pay'])
-        attempts = only_one(status['pay'])['attempts']
+        pay = only_one(status['pay'])
+        assert pay['bolt11'] == inv['bolt11']
+        assert pay['msatoshi'] == 10**5
+        assert pay['destination'] == l5.info['id']
+        assert pay['label'] == "paying test_pay_routeboost5"
+        assert 'routehint_modifications' not in pay
+        assert 'local_exclusions' not in pay
+        attempts = pay['attempts']
 
         # First two failed (w/o routehint and w bad hint), third succeeded.
         assert len(attempts) == 3
@@ -1665,16 +1650,22 @@ def test_pay_direct(node_factory, bitcoind):
 
     # Try multiple times to ensure that route randomization
     # will not override our preference for direct route.
-    for i in range(8):
-        inv = l3.rpc.invoice(20000000, 'pay{}'.format(i), 'desc')['bolt11']
+    invs = l3.rpc.batch([('invoice', [20000000, 'pay{}'.format(i), 'desc'])
+                         for i in range(8)])
+    for inv in invs:
+        l0.rpc.pay(inv['bolt11'])
 
-        l0.rpc.pay(inv)
+    # We should have gone the direct route every time, so
+    # l1->l2 channel msatoshi_to_us should not have changed
+    # (any indirect payment would have moved it for good).
+    l1l2msat = only_one(l1.rpc.getpeer(l2.info['id'])['channels'])['msatoshi_to_us']
+    assert l1l2msat == l1l2msatreference
 
-        # We should have gone the direct route, so
-        # l1->l2 channel msatoshi_to_us should not
-        # have changed.
-        l1l2msat = only_one(l1.rpc.getpeer(l2.info['id'])['channels'])['msatoshi_to_us']
-        assert l1l2msat == l1l2msatreference
+
+def wait_for_channel_fees(node, scid, fees):
+    # Wait until `node` sees (base, ppm) `fees` for each direction of `scid`.
+    wait_for(lambda: [(c['base_fee_millisatoshi'], c['fee_per_millionth'])
+                      for c in node.rpc.listchannels(scid)['channels']] == fees)
 
 
 def test_setchannelfee_usage(node_factory, bitcoind):
@@ -1694,9 +1685,7 @@ def test_setchannelfee_usage(node_factory, bitcoind):
     DEF_BASE = 10
     DEF_PPM = 100
 
-    l1 = node_factory.get_node(options={'fee-base': DEF_BASE, 'fee-per-satoshi': DEF_PPM})
-    l2 = node_factory.get_node(options={'fee-base': DEF_BASE, 'fee-per-satoshi': DEF_PPM})
-    l3 = node_factory.get_node(options={'fee-base': DEF_BASE, 'fee-per-satoshi': DEF_PPM})
+    l1, l2, l3 = node_factory.get_nodes(3, opts={'fee-base': DEF_BASE, 'fee-per-satoshi': DEF_PPM})
     l1.rpc.connect(l2.info['id'], 'localhost', l2.port)
     l1.rpc.connect(l3.info['id'], 'localhost', l3.port)
     l1.fund_channel(l2, 1000000)
@@ -1704,6 +1693,7 @@ def test_setchannelfee_usage(node_factory, bitcoind):
     # get short channel id
     scid = l1.get_channel_scid(l2)
     scid_hex = scid.encode('utf-8').hex()
+    fees_query = 'SELECT feerate_base, feerate_ppm FROM channels WHERE hex(short_channel_id)=?;'
 
     # feerates should be init with global config
     db_fees = l1.db_query('SELECT feerate_base, feerate_ppm FROM channels;')
@@ -1722,15 +1712,12 @@ def test_setchannelfee_usage(node_factory, bitcoind):
     assert(result['channels'][0]['short_channel_id'] == scid)
 
     # check if custom values made it into the database
-    db_fees = l1.db_query(
-        'SELECT feerate_base, feerate_ppm FROM channels '
-        'WHERE hex(short_channel_id)="' + scid_hex + '";')
+    db_fees = l1.db_query(fees_query, params=(scid_hex,))
     assert(db_fees[0]['feerate_base'] == 1337)
     assert(db_fees[0]['feerate_ppm'] == 137)
 
     # wait for gossip and check if l1 sees new fees in listchannels
-    wait_for(lambda: [c['base_fee_millisatoshi'] for c in l1.rpc.listchannels(scid)['channels']] == [DEF_BASE, 1337])
-    wait_for(lambda: [c['fee_per_millionth'] for c in l1.rpc.listchannels(scid)['channels']] == [DEF_PPM, 137])
+    wait_for_channel_fees(l1, scid, [(DEF_BASE, DEF_PPM), (1337, 137)])
 
     # also test with named and missing paramters
     result = l1.rpc.setchannelfee(ppm=42, id=scid)
@@ -1755,9 +1742,7 @@ def test_setchannelfee_usage(node_factory, bitcoind):
     result = l1.rpc.setchannelfee(scid, 0, 0)
     assert(result['base'] == 0)
     assert(result['ppm'] == 0)
-    db_fees = l1.db_query(
-        'SELECT feerate_base, feerate_ppm FROM channels '
-        'WHERE hex(short_channel_id)="' + scid_hex + '";')
+    db_fees = l1.db_query(fees_query, params=(scid_hex,))
     assert(db_fees[0]['feerate_base'] == 0)
     assert(db_fees[0]['feerate_ppm'] == 0)
 
@@ -1766,9 +1751,7 @@ def test_setchannelfee_usage(node_factory, bitcoind):
     assert(result['base'] == DEF_BASE)
     assert(result['ppm'] == DEF_PPM)
     # check default values in DB
-    db_fees = l1.db_query(
-        'SELECT feerate_base, feerate_ppm FROM channels '
-        'WHERE hex(short_channel_id)="' + scid_hex + '";')
+    db_fees = l1.db_query(fees_query, params=(scid_hex,))
     assert(db_fees[0]['feerate_base'] == DEF_BASE)
     assert(db_fees[0]['feerate_ppm'] == DEF_PPM)
 
@@ -1779,9 +1762,7 @@ def test_setchannelfee_usage(node_factory, bitcoind):
     assert(len(result['channels']) == 1)
     assert(result['channels'][0]['peer_id'] == l2.info['id'])
     assert(result['channels'][0]['short_channel_id'] == scid)
-    db_fees = l1.db_query(
-        'SELECT feerate_base, feerate_ppm FROM channels '
-        'WHERE hex(short_channel_id)="' + scid_hex + '";')
+    db_fees = l1.db_query(fees_query, params=(scid_hex,))
     assert(db_fees[0]['feerate_base'] == 42)
     assert(db_fees[0]['feerate_ppm'] == 43)
 
@@ -1794,9 +1775,7 @@ def test_setchannelfee_usage(node_factory, bitcoind):
     # check if 'base' unit can be modified to satoshi
     result = l1.rpc.setchannelfee(scid, '1sat')
     assert(result['base'] == 1000)
-    db_fees = l1.db_query(
-        'SELECT feerate_base, feerate_ppm FROM channels '
-        'WHERE hex(short_channel_id)="' + scid_hex + '";')
+    db_fees = l1.db_query(fees_query, params=(scid_hex,))
     assert(db_fees[0]['feerate_base'] == 1000)
 
     # check if 'ppm' values greater than u32_max fail
@@ -1820,9 +1799,7 @@ def test_setchannelfee_state(node_factory, bitcoind):
     DEF_BASE = 0
     DEF_PPM = 0
 
-    l0 = node_factory.get_node(options={'fee-base': DEF_BASE, 'fee-per-satoshi': DEF_PPM})
-    l1 = node_factory.get_node(options={'fee-base': DEF_BASE, 'fee-per-satoshi': DEF_PPM})
-    l2 = node_factory.get_node(options={'fee-base': DEF_BASE, 'fee-per-satoshi': DEF_PPM})
+    l0, l1, l2 = node_factory.get_nodes(3, opts={'fee-base': DEF_BASE, 'fee-per-satoshi': DEF_PPM})
 
     # connection and funding
     l0.rpc.connect(l1.info['id'], 'localhost', l1.port)
@@ -1887,8 +1864,7 @@ def test_setchannelfee_routing(node_factory, bitcoind):
     l2.rpc.setchannelfee(scid, 1337, 137)
 
     # wait for l1 to see updated channel via gossip
-    wait_for(lambda: [c['base_fee_millisatoshi'] for c in l1.rpc.listchannels(scid)['channels']] == [1337, DEF_BASE])
-    wait_for(lambda: [c['fee_per_millionth'] for c in l1.rpc.listchannels(scid)['channels']] == [137, DEF_PPM])
+    wait_for_channel_fees(l1, scid, [(1337, 137), (DEF_BASE, DEF_PPM)])
 
     # test fees are applied to HTLC forwards
     #
@@ -1913,8 +1889,7 @@ def test_setchannelfee_routing(node_factory, bitcoind):
     l2.rpc.setchannelfee(scid)
 
     # wait for l1 to see default values again via gossip
-    wait_for(lambda: [c['base_fee_millisatoshi'] for c in l1.rpc.listchannels(scid)['channels']] == [DEF_BASE, DEF_BASE])
-    wait_for(lambda: [c['fee_per_millionth'] for c in l1.rpc.listchannels(scid)['channels']] == [DEF_PPM, DEF_PPM])
+    wait_for_channel_fees(l1, scid, [(DEF_BASE, DEF_PPM), (DEF_BASE, DEF_PPM)])
 
     # test if global fees are applied again (base 1 ppm 10)
     # 1 + 4999999 * 10 / 1000000 = 50.999 (50)
@@ -1951,8 +1926,7 @@ def test_setchannelfee_zero(node_factory, bitcoind):
 
     # TEST ZERO fees possible
     l2.rpc.setchannelfee(scid, 0, 0)
-    wait_for(lambda: [c['base_fee_millisatoshi'] for c in l1.rpc.listchannels(scid)['channels']] == [0, DEF_BASE])
-    wait_for(lambda: [c['fee_per_millionth'] for c in l1.rpc.listchannels(scid)['channels']] == [0, DEF_PPM])
+    wait_for_channel_fees(l1, scid, [(0, 0), (DEF_BASE, DEF_PPM)])
 
     # test if zero fees are applied
     route = l1.rpc.getroute(l3.info['id'], 4999999, 1)["route"]
@@ -2009,7 +1983,7 @@ def test_setchannelfee_restart(node_factory, bitcoind):
     assert result['msatoshi_sent'] == 5002020
 
 
-def test_setchannelfee_all(node_factory, bitcoind):
+def test_setchannelfee_all(node_factory, bitcoind, executor):
     # TEST SETUP
     #
     # [l1]----> [l2]
@@ -2018,30 +1992,47 @@ def test_setchannelfee_all(node_factory, bitcoind):
     DEF_BASE = 10
     DEF_PPM = 100
 
-    l1 = node_factory.get_node(options={'fee-base': DEF_BASE, 'fee-per-satoshi': DEF_PPM})
-    l2 = node_factory.get_node(options={'fee-base': DEF_BASE, 'fee-per-satoshi': DEF_PPM})
-    l3 = node_factory.get_node(options={'fee-base': DEF_BASE, 'fee-per-satoshi': DEF_PPM})
-    l1.rpc.connect(l2.info['id'], 'localhost', l2.port)
-    l1.rpc.connect(l3.info['id'], 'localhost', l3.port)
-    l1.fund_channel(l2, 1000000)
-    l1.fund_channel(l3, 1000000)
+    l1, l2, l3 = node_factory.get_nodes(3, opts={'fee-base': DEF_BASE, 'fee-per-satoshi': DEF_PPM})
+    # The two peers are independent, so connect to both at once.
+    futs = [executor.submit(l1.rpc.connect, n.info['id'], 'localhost', n.port) for n in (l2, l3)]
+    for f in futs:
+        f.result(TIMEOUT)
 
-    # get short channel id
-    scid2 = l1.get_channel_scid(l2)
-    scid3 = l1.get_channel_scid(l3)
+    # Give l1 one output per channel, so both open in the same block.
+    for _ in range(2):
+        addr = l1.rpc.newaddr()['bech32']
+        bitcoind.rpc.sendtoaddress(addr, (1000000 + 1000000) / 10**8)
+    bitcoind.generate_block(1)
+    wait_for(lambda: len(l1.rpc.listfunds()['outputs']) == 2)
+
+    txids = [l1.rpc.fundchannel(n.info['id'], 1000000)['txid'] for n in (l2, l3)]
+    bitcoind.generate_block(1, wait_for_mempool=txids)
+    for n in (l2, l3):
+        wait_for(lambda: l1.channel_state(n) == 'CHANNELD_NORMAL')
+
+    # get short channel ids from a single listpeers
+    peers = {p['id']: p for p in l1.rpc.listpeers()['peers']}
+    scid2 = only_one(peers[l2.info['id']]['channels'])['short_channel_id']
+    scid3 = only_one(peers[l3.info['id']]['channels'])['short_channel_id']
+    l1.wait_channel_active(scid2)
+    l1.wait_channel_active(scid3)
 
     # now try to set all (two) channels using wildcard syntax
     result = l1.rpc.setchannelfee("all", 0xDEAD, 0xBEEF)
 
-    wait_for(lambda: [c['base_fee_millisatoshi'] for c in l1.rpc.listchannels(scid2)['channels']] == [DEF_BASE, 0xDEAD])
-    wait_for(lambda: [c['fee_per_millionth'] for c in l1.rpc.listchannels(scid2)['channels']] == [DEF_PPM, 0xBEEF])
-    wait_for(lambda: [c['base_fee_millisatoshi'] for c in l1.rpc.listchannels(scid3)['channels']] == [0xDEAD, DEF_BASE])
-    wait_for(lambda: [c['fee_per_millionth'] for c in l1.rpc.listchannels(scid3)['channels']] == [0xBEEF, DEF_PPM])
+    # wait until l1 sees the new fees on its side of both channels
+    expected_fees = {(scid2, l1.info['id']): (0xDEAD, 0xBEEF),
+                     (scid2, l2.info['id']): (DEF_BASE, DEF_PPM),
+                     (scid3, l1.info['id']): (0xDEAD, 0xBEEF),
+                     (scid3, l3.info['id']): (DEF_BASE, DEF_PPM)}
+
+    def all_fees_updated():
+        fees = {(c['short_channel_id'], c['source']): (c['base_fee_millisatoshi'], c['fee_per_millionth'])
+                for c in l1.rpc.listchannels()['channels']}
+        return fees == expected_fees
+    wait_for(all_fees_updated)
 
     assert len(result['channels']) == 2
     assert result['base'] == 0xDEAD
     assert result['ppm'] == 0xBEEF
-    assert result['channels'][0]['peer_id'] == l2.info['id']
-    assert result['channels'][0]['short_channel_id'] == scid2
-    assert result['channels'][1]['peer_id'] == l3.info['id']
-    assert result['channels'][1]['short_channel_id'] == scid3
+    assert {(c['peer_id'], c['short_channel_id']) for c in result['channels']} == {(l2.info['id'], scid2), (l3.info['id'], scid3)}
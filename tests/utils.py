@@ -197,6 +197,9 @@ class TailableProc(object):
         fail if the timeout is exceeded or if the underlying process
         exits before all the `regexs` were found.
 
+        Each entry in `regexs` may be a string or a precompiled pattern; they
+        are compiled once per call, not once per log line.
+
         If timeout is None, no time-out is applied.
         """
         logging.debug("Waiting for {} in the logs".format(regexs))
@@ -499,7 +502,7 @@ class LightningNode(object):
     def getactivechannels(self):
         return [c for c in self.rpc.listchannels()['channels'] if c['active']]
 
-    def db_query(self, query, use_copy=True):
+    def db_query(self, query, use_copy=True, params=()):
         orig = os.path.join(self.daemon.lightning_dir, "lightningd.sqlite3")
         if use_copy:
             copy = os.path.join(self.daemon.lightning_dir, "lightningd-copy.sqlite3")
@@ -510,7 +513,7 @@ class LightningNode(object):
 
         db.row_factory = sqlite3.Row
         c = db.cursor()
-        c.execute(query)
+        c.execute(query, params)
         rows = c.fetchall()
 
         result = []